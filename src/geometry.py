@@ -51,6 +51,37 @@ def points_dist(points1: Point, points2: Points) -> np.ndarray[float]:
     return np.linalg.norm(diff, axis=2)
 
 
+def bounding_boxes_overlap(
+    boxes1: np.ndarray, boxes2: np.ndarray, tol: float = 0
+) -> np.ndarray[bool]:
+    """Determine whether pairs of axis-aligned bounding boxes overlap.
+
+    Parameters
+    ----------
+    boxes1
+        Array of bounding boxes, the last axis holds
+        `(min_row, min_col, max_row, max_col)`.
+    boxes2
+        Array of bounding boxes with the same layout, broadcastable against `boxes1`.
+    tol
+        Boxes which are closer to each other than this number are considered
+        overlapping as well.
+
+    Returns
+    -------
+    overlaps
+        Boolean array, True where the corresponding boxes overlap.
+    """
+    return np.logical_and.reduce(
+        [
+            boxes1[..., 2] + tol >= boxes2[..., 0],
+            boxes2[..., 2] + tol >= boxes1[..., 0],
+            boxes1[..., 3] + tol >= boxes2[..., 1],
+            boxes2[..., 3] + tol >= boxes1[..., 1],
+        ]
+    )
+
+
 def normalize_interval(interval: Interval, cycle_length: int) -> Interval:
     """Normalize interval within the cycle domain.
 
@@ -371,6 +402,14 @@ class Transformation:
         """Return transformation rotation matrix."""
         return get_rotation_matrix(self.rotation_angle)
 
+    @property
+    def params(self) -> np.ndarray:
+        """Return transformation parameters as an array `(angle, t_row, t_col)`."""
+        return np.array(
+            [self.rotation_angle, self.translation[0], self.translation[1]],
+            dtype=float,
+        )
+
     def apply(self, points: Points) -> Points:
         """Apply transformation to a set of points
 
@@ -437,10 +476,66 @@ class Transformation:
         return cls(params["rotation_angle"], np.array(params["translation"]))
 
 
+def transformations_close(
+    transformations1: list[Transformation],
+    transformations2: list[Transformation],
+    angle_tol: float = 0.17,
+    translation_tol: float = 21,
+) -> np.ndarray[bool]:
+    """Compare pairs of transformations at once.
+
+    Vectorized version of `Transformation.is_close`.
+
+    Parameters
+    ----------
+    transformations1
+        List of transformations.
+    transformations2
+        List of transformations of the same length.
+    angle_tol
+        Maximal difference of rotation angles.
+    translation_tol
+        Maximal distance of translations.
+
+    Returns
+    -------
+    close
+        Boolean array, True where `transformations1[i]` is close to
+        `transformations2[i]`.
+    """
+    params1 = np.array([t.params for t in transformations1]).reshape(-1, 3)
+    params2 = np.array([t.params for t in transformations2]).reshape(-1, 3)
+    diff = params1 - params2
+    return (np.abs(diff[:, 0]) <= angle_tol) & (
+        np.linalg.norm(diff[:, 1:], axis=1) <= translation_tol
+    )
+
+
 def get_common_contour_idxs(
-    contour1: Points, contour2: Points, tol: float = 10
+    contour1: Points, contour2: Points, tol: float = 10, tree1: KDTree | None = None
 ) -> tuple[np.ndarray, np.ndarray]:
-    tree1 = KDTree(contour1)
+    """Find indexes of points of two contours which are close to each other.
+
+    Parameters
+    ----------
+    contour1
+        2d array of points of the first contour.
+    contour2
+        2d array of points of the second contour.
+    tol
+        Maximum distance of two points to be considered close.
+    tree1
+        Precomputed KDTree of `contour1`. If not given, it is built on each call.
+
+    Returns
+    -------
+    idxs1
+        Indexes of the closest points of `contour1`.
+    idxs2
+        Indexes of points of `contour2` which have a close point in `contour1`.
+    """
+    if tree1 is None:
+        tree1 = KDTree(contour1)
     distances, points = tree1.query(contour2, k=1)
     # Return indexes of points which are close enough
     close_mask = distances < tol
@@ -448,14 +543,13 @@ def get_common_contour_idxs(
 
 
 def get_common_contour(
-    contour1: Points, contour2: Points, tol: float = 10
+    contour1: Points, contour2: Points, tol: float = 10, tree1: KDTree | None = None
 ) -> tuple[Points, Points]:
-    tree1 = KDTree(contour1)
-    distances, points = tree1.query(contour2, k=1)
-    # Return points which are close enough
-    close_mask = distances < tol
-    return contour1[points[close_mask]], contour2[close_mask]
+    idxs1, idxs2 = get_common_contour_idxs(contour1, contour2, tol, tree1)
+    return contour1[idxs1], contour2[idxs2]
 
 
-def get_common_contour_length(contour1: Points, contour2: Points, tol: float = 10):
-    return len(get_common_contour(contour1, contour2, tol)[0])
+def get_common_contour_length(
+    contour1: Points, contour2: Points, tol: float = 10, tree1: KDTree | None = None
+):
+    return len(get_common_contour_idxs(contour1, contour2, tol, tree1)[0])
@@ -7,21 +7,22 @@ from typing import TYPE_CHECKING
 
 import cv2 as cv
 import numpy as np
+import shapely
 from more_itertools import flatten
 from rustworkx import PyGraph, connected_components
 from scipy.ndimage import gaussian_filter1d
-from shapely import Polygon
+from shapely import Polygon, STRtree
 from shapely.ops import unary_union
 from skimage.transform import rotate
 
-from geometry import Transformation, get_common_contour_idxs, icp
+from geometry import Transformation, bounding_boxes_overlap, icp, transformations_close
 from piece_assemble.neighbors import get_border_complexity
+from piece_assemble.piece import TransformedPiece
 from piece_assemble.visualization import draw_contour
 
 if TYPE_CHECKING:
 
     from piece_assemble.neighbors import NeighborClassifierBase
-    from piece_assemble.piece import TransformedPiece
     from piece_assemble.types import Points
 
 
@@ -149,6 +150,7 @@ class Cluster:
             self.parents,
         )
         new_cluster.border_length = self.border_length
+        self._share_self_intersection(new_cluster)
         return new_cluster
 
     def transform(self, transformation: Transformation) -> Cluster:
@@ -166,8 +168,18 @@ class Cluster:
             parents=[self],
         )
         new_cluster.border_length = self.border_length
+        self._share_self_intersection(new_cluster)
         return new_cluster
 
+    def _share_self_intersection(self, other: Cluster) -> None:
+        """Pass already computed self intersection to a cluster with the same pieces.
+
+        Transformations only rotate and translate pieces, so the self intersection
+        doesn't change when the whole cluster is transformed.
+        """
+        if "self_intersection" in self.__dict__:
+            other.__dict__["self_intersection"] = self.self_intersection
+
     @cached_property
     def dist(self) -> float:
         dists = []
@@ -185,22 +197,76 @@ class Cluster:
 
     @cached_property
     def self_intersection(self) -> float:
-        polygons = self.transformed_polygons
-        return max(
-            [
-                p1.intersection(p2).area / min(p1.area, p2.area)
-                for p1, p2 in combinations(polygons, 2)
-            ]
+        _, _, ratios = self._intersection_ratios
+        if len(ratios) == 0:
+            return 0.0
+        return ratios.max()
+
+    @cached_property
+    def _intersection_ratios(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return intersection ratios of all overlapping pairs of pieces.
+
+        Only pairs reported by the STRtree query are intersected, all other pairs
+        have zero intersection.
+
+        Returns
+        -------
+        idxs1, idxs2
+            Indexes of overlapping pieces in `self.pieces`, `idxs1[i] < idxs2[i]`.
+        ratios
+            Area of the intersection divided by the area of the smaller piece.
+        """
+        polygons = np.array(self.transformed_polygons, dtype=object)
+        idxs1, idxs2 = STRtree(polygons).query(polygons, predicate="intersects")
+        mask = idxs1 < idxs2
+        idxs1, idxs2 = idxs1[mask], idxs2[mask]
+
+        areas = self.piece_areas
+        intersection_areas = shapely.area(
+            shapely.intersection(polygons[idxs1], polygons[idxs2])
+        )
+        return (
+            idxs1,
+            idxs2,
+            intersection_areas / np.minimum(areas[idxs1], areas[idxs2]),
         )
 
-    @property
+    @cached_property
     def transformed_polygons(self) -> list[Polygon]:
-        return [piece.polygon for piece in self.pieces.values()]
+        """Return transformed piece polygons in the order of `self.pieces`."""
+        pieces = list(self.pieces.values())
+        TransformedPiece.transform_polygons(pieces)
+        return [piece.polygon for piece in pieces]
+
+    @cached_property
+    def piece_areas(self) -> np.ndarray:
+        """Return areas of pieces in the order of `self.pieces`."""
+        return np.array([piece.area for piece in self.pieces.values()])
+
+    @cached_property
+    def polygon_bounds(self) -> np.ndarray:
+        """Return bounding boxes of transformed piece polygons.
+
+        2d array of shape `[N, 4]`, where the i-th row contains
+        `(min_row, min_col, max_row, max_col)` of the i-th piece in `self.pieces`.
+        """
+        return shapely.bounds(np.array(self.transformed_polygons, dtype=object))
 
     def intersection(self, polygon: Polygon) -> float:
-        polygons = self.transformed_polygons
-        return max(
-            [p.intersection(polygon).area / min(p.area, polygon.area) for p in polygons]
+        # Pieces with disjoint bounding boxes cannot intersect the polygon
+        is_candidate = bounding_boxes_overlap(
+            self.polygon_bounds, np.array(polygon.bounds)
+        )
+        if not is_candidate.any():
+            return 0.0
+
+        polygons = np.array(self.transformed_polygons, dtype=object)[is_candidate]
+        intersection_areas = shapely.area(shapely.intersection(polygons, polygon))
+        return float(
+            np.max(
+                intersection_areas
+                / np.minimum(self.piece_areas[is_candidate], polygon.area)
+            )
         )
 
     @cached_property
@@ -232,14 +298,14 @@ class Cluster:
             np.log2(len(new_pieces)) + 1
         )
 
-        for key1, key2 in combinations(self.pieces.keys(), 2):
-            p1 = self.pieces[key1].polygon
-            p2 = self.pieces[key2].polygon
-            if p1.intersection(p2).area / min(p1.area, p2.area) > self_intersection_tol:
-                if key1 not in pieces_to_keep:
-                    new_pieces.pop(key1, None)
-                if key2 not in pieces_to_keep:
-                    new_pieces.pop(key2, None)
+        keys = list(self.pieces.keys())
+        idxs1, idxs2, ratios = self._intersection_ratios
+        overlapping = ratios > self_intersection_tol
+        for i, j in zip(idxs1[overlapping], idxs2[overlapping]):
+            if keys[i] not in pieces_to_keep:
+                new_pieces.pop(keys[i], None)
+            if keys[j] not in pieces_to_keep:
+                new_pieces.pop(keys[j], None)
 
         if len(new_pieces) == 0:
             raise SelfIntersectionError(
@@ -278,7 +344,7 @@ class Cluster:
         if len(common_keys) == 0:
             return None, None
 
-        common_keys.sort(key=lambda key: self.pieces[key].polygon.area, reverse=True)
+        common_keys.sort(key=lambda key: self.pieces[key].area, reverse=True)
         common_key = common_keys.pop()
 
         return (
@@ -323,14 +389,13 @@ class Cluster:
         cluster2 = other.transform(t2)
 
         parents = [cluster1, cluster2]
+        # Don't modify pieces of the transformed clusters, they are kept as parents
+        pieces2 = cluster2.pieces.copy()
 
         common_keys = list(self.piece_ids.intersection(other.piece_ids))
-        for key in common_keys:
-            if not cluster1.pieces[key].transformation.is_close(
-                cluster2.pieces[key].transformation,
-                self.rotation_tol,
-                self.translation_tol,
-            ):
+        is_close = self._common_transformations_close(cluster1, cluster2, common_keys)
+        for key, key_is_close in zip(common_keys, is_close):
+            if not key_is_close:
                 if not try_fix:
                     raise ConflictingTransformationsError(
                         f"Transformations {cluster1.pieces[key].transformation} and "
@@ -338,10 +403,10 @@ class Cluster:
                     )
                 parents = [cluster1]
                 was_fixed = True
-                cluster2.pieces.pop(key)
+                pieces2.pop(key)
 
-        new_pieces = cluster1.pieces
-        new_pieces.update(cluster2.pieces)
+        new_pieces = cluster1.pieces.copy()
+        new_pieces.update(pieces2)
         new_cluster = Cluster(
             new_pieces,
             self.scorer,
@@ -360,7 +425,7 @@ class Cluster:
             np.log2(len(new_cluster.pieces)) + 1
         )
         if new_cluster.self_intersection > self_intersection_tol:
-            if not try_fix or len(cluster2.pieces) == 2:
+            if not try_fix or len(pieces2) == 2:
                 raise SelfIntersectionError(
                     f"Self intersection {new_cluster.self_intersection} "
                     f"is higher than tolerance {self_intersection_tol}"
@@ -408,13 +473,20 @@ class Cluster:
         cluster1 = self.transform(t1)
         cluster2 = other.transform(t2)
 
-        return all(
-            cluster1.pieces[key].transformation.is_close(
-                cluster2.pieces[key].transformation,
-                self.rotation_tol,
-                self.translation_tol,
-            )
-            for key in common_keys
+        is_close = self._common_transformations_close(
+            cluster1, cluster2, list(common_keys)
+        )
+        return bool(is_close.all())
+
+    def _common_transformations_close(
+        self, cluster1: Cluster, cluster2: Cluster, keys: list[str]
+    ) -> np.ndarray[bool]:
+        """Check whether given pieces have close transformations in both clusters."""
+        return transformations_close(
+            [cluster1.pieces[key].transformation for key in keys],
+            [cluster2.pieces[key].transformation for key in keys],
+            self.rotation_tol,
+            self.translation_tol,
         )
 
     def can_be_merged(self, other: Cluster) -> bool:
@@ -443,17 +515,13 @@ class Cluster:
         cluster1 = self.transform(t1)
         cluster2 = other.transform(t2)
 
-        if not all(
-            cluster1.pieces[key].transformation.is_close(
-                cluster2.pieces[key].transformation,
-                self.rotation_tol,
-                self.translation_tol,
-            )
-            for key in common_keys
-        ):
+        is_close = self._common_transformations_close(
+            cluster1, cluster2, list(common_keys)
+        )
+        if not is_close.all():
             return False
 
-        new_pieces = cluster1.pieces
+        new_pieces = cluster1.pieces.copy()
         new_pieces.update(cluster2.pieces)
         new_cluster = Cluster(
             new_pieces,
@@ -542,17 +610,15 @@ class Cluster:
                 }
                 matches_border_dict.update(parent_dict)
 
-        for key1, key2 in combinations(self.piece_ids, 2):
+        for key1, key2 in self.get_touching_pairs():
             key1, key2 = min(key1, key2), max(key1, key2)
             if (key1, key2) in matches_border_dict.keys():
                 continue
             piece1 = self.pieces[key1]
             piece2 = self.pieces[key2]
 
-            idxs1, idxs2 = get_common_contour_idxs(
-                piece1.contour,
-                piece2.contour,
-                self.border_dist_tol,
+            idxs1, idxs2 = piece1.get_common_contour_idxs(
+                piece2.contour, self.border_dist_tol
             )
 
             if len(idxs1) == 0:
@@ -561,6 +627,34 @@ class Cluster:
 
         return matches_border_dict
 
+    @cached_property
+    def contour_bounds(self) -> np.ndarray:
+        """Return bounding boxes of transformed piece contours.
+
+        2d array of shape `[N, 4]`, where the i-th row contains
+        `(min_row, min_col, max_row, max_col)` of the i-th piece in `self.pieces`.
+        """
+        return np.array(
+            [
+                np.concatenate((piece.contour.min(axis=0), piece.contour.max(axis=0)))
+                for piece in self.pieces.values()
+            ]
+        )
+
+    def get_touching_pairs(self) -> list[tuple[str, str]]:
+        """Return pairs of pieces which may share a border.
+
+        Pieces whose contour bounding boxes are further than `border_dist_tol` apart
+        cannot have any common border points, so they are skipped.
+        """
+        keys = list(self.pieces.keys())
+        idxs1, idxs2 = np.triu_indices(len(keys), 1)
+        bounds = self.contour_bounds
+        mask = bounding_boxes_overlap(
+            bounds[idxs1], bounds[idxs2], self.border_dist_tol
+        )
+        return [(keys[i], keys[j]) for i, j in zip(idxs1[mask], idxs2[mask])]
+
     def get_match_border_idxs(self, key1, key2):
         if (key1, key2) in self.matches_border_idxs.keys():
             idxs1, idxs2 = self.matches_border_idxs[(key1, key2)]
@@ -584,7 +678,7 @@ class Cluster:
     @cached_property
     def complexity(self):
         total_complexity = 0
-        for key1, key2 in combinations(self.piece_ids, 2):
+        for key1, key2 in self.get_touching_pairs():
             total_complexity += get_border_complexity(
                 self.pieces[key1], self.pieces[key2], self.border_dist_tol
             )
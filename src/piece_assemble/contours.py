@@ -52,6 +52,8 @@ def smooth_contours(contours: Points, sigma: float, cyclic: bool = True) -> Poin
         2d array of points
     sigma
         Size of the gaussian filter
+    cyclic
+        Whether the curve is closed.
 
     Returns
     -------
@@ -62,13 +64,7 @@ def smooth_contours(contours: Points, sigma: float, cyclic: bool = True) -> Poin
         return contours
 
     mode = "wrap" if cyclic else "reflect"
-    return np.stack(
-        [
-            gaussian_filter1d(contours[:, 0].astype(float), sigma, mode=mode),
-            gaussian_filter1d(contours[:, 1].astype(float), sigma, mode=mode),
-        ],
-        axis=1,
-    )
+    return gaussian_filter1d(contours.astype(float), sigma, axis=0, mode=mode)
 
 
 def diff(f: np.ndarray) -> np.ndarray:
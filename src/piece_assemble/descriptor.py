@@ -7,9 +7,10 @@ from typing import TYPE_CHECKING
 
 import numpy as np
 from more_itertools import flatten
+from numba import njit, prange
 from tqdm import tqdm
 
-from geometry import extend_interval, extend_intervals, interval_difference, points_dist
+from geometry import extend_interval
 from piece_assemble.contours import get_osculating_circles, get_validity_intervals
 from piece_assemble.matching.match import Match
 from piece_assemble.segment import ApproximatingArc
@@ -17,7 +18,7 @@ from piece_assemble.segment import ApproximatingArc
 if TYPE_CHECKING:
     from piece_assemble.piece import Piece
     from piece_assemble.segment import Segment
-    from piece_assemble.types import NpImage, Point, Points
+    from piece_assemble.types import NpImage, Points
 
 
 class Descriptor(ABC):
@@ -101,9 +102,29 @@ class OsculatingCircleDescriptor(DescriptorExtractor):
             segment for segment in segments if len(segment) >= self.min_segment_len
         ]
 
-        descriptor = np.array(
-            [self.segment_descriptor(segment, image) for segment in segments]
-        )
+        return self.describe_segments(contour, segments, image)
+
+    def describe_segments(
+        self, contour: Points, segments: list[Segment], image: NpImage
+    ) -> SegmentDescriptor:
+        """Create a descriptor from given segments of the contour.
+
+        Parameters
+        ----------
+        contour
+            2d array of all points representing a shape contour.
+        segments
+            List of contour segments.
+        image
+            Image of the piece, used for the color part of the descriptor.
+
+        Returns
+        -------
+        A descriptor of the contour.
+        """
+        descriptor = self.segments_descriptor(contour, segments, image)
+        # Single precision halves the memory traffic of pairwise distance computations
+        descriptor = descriptor.astype(np.float32)
 
         contour_segment_idxs = np.full(len(contour), -1)
         for i, segment in enumerate(segments):
@@ -115,18 +136,30 @@ class OsculatingCircleDescriptor(DescriptorExtractor):
 
         return SegmentDescriptor(segments, descriptor, contour_segment_idxs)
 
-    def _get_points(self, segment: Segment, n_points: int) -> list[Point]:
-        p_start = segment.contour[0]
-        p_end = segment.contour[-1]
+    def _get_points_idxs(self, lengths: np.ndarray, n_points: int) -> np.ndarray:
+        """Get indexes of evenly spaced points of segments with given lengths.
 
-        subsegment_len = len(segment) // (n_points - 1)
-        points = [
-            p_start,
-            *[segment.contour[subsegment_len * (i + 1)] for i in range(n_points - 2)],
-            p_end,
-        ]
+        Parameters
+        ----------
+        lengths
+            1d array of segment lengths.
+        n_points
+            Number of points selected from each segment, including both end points.
 
-        return points
+        Returns
+        -------
+        idxs
+            2d array where `idxs[i]` are indexes of points within the i-th segment.
+        """
+        subsegment_len = lengths // (n_points - 1)
+        inner_idxs = subsegment_len[:, np.newaxis] * np.arange(1, n_points - 1)
+        return np.hstack(
+            (
+                np.zeros((len(lengths), 1), dtype=int),
+                inner_idxs,
+                (lengths - 1)[:, np.newaxis],
+            )
+        )
 
     def segment_descriptor(
         self, segment: Segment, piece_img: NpImage
@@ -142,48 +175,91 @@ class OsculatingCircleDescriptor(DescriptorExtractor):
         -------
         A descriptor of contour segment - an array of 3 2d vectors.
         """
-        centroid = segment.contour.mean(axis=0)
-        p_start = segment.contour[0]
-        p_end = segment.contour[-1]
+        return self.segments_descriptor(segment.curve, [segment], piece_img)[0]
 
-        # Determine segment rotation
-        rot_vector = p_start - p_end
-        rot_vector = rot_vector / np.linalg.norm(rot_vector)
+    def segments_descriptor(
+        self, contour: Points, segments: list[Segment], piece_img: NpImage
+    ) -> np.ndarray[float]:
+        """Get descriptors of all given curve segments at once.
 
-        sin_a = rot_vector[0]
-        cos_a = rot_vector[1]
-        rot_matrix = np.array([[cos_a, sin_a], [-sin_a, cos_a]])
+        All points are gathered directly from `contour` using the segment intervals
+        shifted by the segment offsets.
 
-        vectors = self._get_points(segment, self.n_points)
-        desc_vectors = [(vector - centroid) @ rot_matrix for vector in vectors]
+        Parameters
+        ----------
+        contour
+            2d array of all points representing a shape contour.
+        segments
+            List of segments of `contour`.
+        piece_img
+            Image of the piece, used for the color part of the descriptor.
 
-        colors_points = self._get_points(segment, self.n_colors)
-        desc_colors = [
-            piece_img[round(point[0]), round(point[1])] for point in colors_points
+        Returns
+        -------
+        2d array where the i-th row is the descriptor of the i-th segment.
+        """
+        if len(segments) == 0:
+            return np.array([])
+
+        cycle_length = len(contour)
+        starts = (
+            np.array([segment.interval[0] + segment.offset for segment in segments])
+            % cycle_length
+        )
+        lengths = np.array([len(segment) for segment in segments])
+
+        # Segments may wrap around the end of the contour, so compute the point sums
+        # from the cumulative sum of the contour repeated twice.
+        contour_cumsum = np.concatenate(
+            (
+                np.zeros((1, 2)),
+                np.cumsum(np.concatenate((contour, contour)), axis=0, dtype=float),
+            )
+        )
+        centroids = (
+            contour_cumsum[starts + lengths] - contour_cumsum[starts]
+        ) / lengths[:, np.newaxis]
+
+        vectors = contour[
+            (starts[:, np.newaxis] + self._get_points_idxs(lengths, self.n_points))
+            % cycle_length
         ]
 
-        return np.concatenate(desc_vectors + desc_colors)
+        # Determine segment rotations
+        p_start = vectors[:, 0]
+        p_end = vectors[:, -1]
+        rot_vectors = p_start - p_end
+        rot_vectors = rot_vectors / np.linalg.norm(rot_vectors, axis=1)[:, np.newaxis]
+
+        sin_a = rot_vectors[:, 0]
+        cos_a = rot_vectors[:, 1]
+        rot_matrices = np.stack(
+            (np.stack((cos_a, sin_a), axis=1), np.stack((-sin_a, cos_a), axis=1)),
+            axis=1,
+        )
 
-    def color_dist(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
-        dist = np.zeros((first.shape[0], second.shape[0]))
+        desc_vectors = np.einsum(
+            "nkj,nji->nki", vectors - centroids[:, np.newaxis, :], rot_matrices
+        )
 
-        for i in range(self.n_colors):
-            dist += points_dist(
-                first[
-                    :,
-                    self.n_points * 2
-                    + i * self.channels : self.n_points * 2
-                    + (i + 1) * self.channels,
-                ],
-                second[
-                    :,
-                    first.shape[1]
-                    - (i + 1) * self.channels : first.shape[1]
-                    - i * self.channels,
-                ],
+        colors_points = contour[
+            (starts[:, np.newaxis] + self._get_points_idxs(lengths, self.n_colors))
+            % cycle_length
+        ]
+        colors_points = np.round(colors_points).astype(int)
+        desc_colors = piece_img[colors_points[:, :, 0], colors_points[:, :, 1]]
+
+        return np.hstack(
+            (
+                desc_vectors.reshape(len(segments), -1),
+                desc_colors.reshape(len(segments), -1),
             )
+        )
 
-        return dist / self.n_colors
+    def color_dist(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        return _color_distance_numba(
+            first, second, self.n_points * 2, self.n_colors, self.channels
+        )
 
     def color_var(self, desc: np.ndarray) -> float:
         vars = [
@@ -203,15 +279,7 @@ class OsculatingCircleDescriptor(DescriptorExtractor):
         return var
 
     def spatial_dist(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
-        dist = np.zeros((first.shape[0], second.shape[0]))
-
-        for i in range(self.n_points):
-            dist += points_dist(
-                first[:, i * 2 : (i + 1) * 2],
-                -second[:, (self.n_points - i - 1) * 2 : (self.n_points - i) * 2],
-            )
-
-        dist = dist / self.n_points
+        dist = _desc_distance_numba(first, second, self.n_points)
         dist[dist > self.spatial_dist_thr] = np.inf
         return dist
 
@@ -348,19 +416,90 @@ class MultiOsculatingCircleDescriptor(OsculatingCircleDescriptor):
             segment for segment in segments if len(segment) >= self.min_segment_len
         ]
 
-        descriptor = np.array(
-            [self.segment_descriptor(segment, image) for segment in segments]
-        )
+        return self.describe_segments(contour, segments, image)
 
-        contour_segment_idxs = np.full(len(contour), -1)
-        for i, segment in enumerate(segments):
-            if segment.interval[0] < segment.interval[1]:
-                contour_segment_idxs[segment.interval[0] : segment.interval[1]] = i
-            else:
-                contour_segment_idxs[segment.interval[0] :] = i
-                contour_segment_idxs[: segment.interval[1]] = i
 
-        return SegmentDescriptor(segments, descriptor, contour_segment_idxs)
+@njit(parallel=True, fastmath=True, cache=True)
+def _desc_distance_numba(desc1: np.ndarray, desc2: np.ndarray, k: int) -> np.ndarray:
+    """Compute spatial distances of all pairs of segment descriptors.
+
+    The spatial part of the descriptor consists of `k` 2d vectors stored in the first
+    `2 * k` columns. The vectors of the second descriptor are taken in the reversed
+    order and negated, because the matching segments have opposite orientation.
+
+    Parameters
+    ----------
+    desc1
+        2d array of descriptors, one row per segment.
+    desc2
+        2d array of descriptors, one row per segment.
+    k
+        Number of spatial vectors in each descriptor.
+
+    Returns
+    -------
+    distances
+        2d array where the mean distance of vectors of `desc1[i]` and `desc2[j]` is
+        stored at position `[i, j]`.
+    """
+    out = np.empty((desc1.shape[0], desc2.shape[0]))
+    for i in prange(desc1.shape[0]):
+        for j in range(desc2.shape[0]):
+            s = 0.0
+            for v in range(k):
+                dx = desc1[i, 2 * v] + desc2[j, 2 * (k - v - 1)]
+                dy = desc1[i, 2 * v + 1] + desc2[j, 2 * (k - v - 1) + 1]
+                s += np.sqrt(dx * dx + dy * dy)
+            out[i, j] = s / k
+    return out
+
+
+# No fastmath here, descriptors without colors have to give NaN distances
+@njit(parallel=True, error_model="numpy", cache=True)
+def _color_distance_numba(
+    desc1: np.ndarray, desc2: np.ndarray, start: int, n_colors: int, channels: int
+) -> np.ndarray:
+    """Compute color distances of all pairs of segment descriptors.
+
+    The color part of the descriptor consists of `n_colors` colors with `channels`
+    channels each, stored from the column `start` to the end of the descriptor.
+    The colors of the second descriptor are taken in the reversed order, because
+    the matching segments have opposite orientation.
+
+    Parameters
+    ----------
+    desc1
+        2d array of descriptors, one row per segment.
+    desc2
+        2d array of descriptors, one row per segment.
+    start
+        Index of the first color column.
+    n_colors
+        Number of colors in each descriptor.
+    channels
+        Number of channels of each color.
+
+    Returns
+    -------
+    distances
+        2d array where the mean distance of colors of `desc1[i]` and `desc2[j]` is
+        stored at position `[i, j]`.
+    """
+    end = desc1.shape[1]
+    out = np.empty((desc1.shape[0], desc2.shape[0]))
+    for i in prange(desc1.shape[0]):
+        for j in range(desc2.shape[0]):
+            s = 0.0
+            for v in range(n_colors):
+                col1 = start + v * channels
+                col2 = end - (v + 1) * channels
+                sq = 0.0
+                for c in range(channels):
+                    d = desc1[i, col1 + c] - desc2[j, col2 + c]
+                    sq += d * d
+                s += np.sqrt(sq)
+            out[i, j] = s / n_colors
+    return out
 
 
 def approximate_curve_by_circles(
@@ -390,48 +529,130 @@ def approximate_curve_by_circles(
         approximated by this circle.
     """
     validity_intervals = get_validity_intervals_split(contour, radii, centers, tol_dist)
-    cycle_length = contour.shape[0]
-    validity_intervals_extended = extend_intervals(validity_intervals, cycle_length)
-    interval_indexes = np.arange(len(validity_intervals))
-
-    # In each iteration, find the osculating circle with the largest validity interval.
-    # Then, update all other intervals and repeat.
-    arcs = []
-    while True:
-        valid_lengths = (
-            validity_intervals_extended[:, 1] - validity_intervals_extended[:, 0]
-        )
-        max_i = np.argmax(valid_lengths)
-        length = valid_lengths[max_i]
-        if length <= 1:
-            break
-        validity_interval = validity_intervals[max_i]
-        arcs.append((interval_indexes[max_i], validity_interval))
-        validity_intervals = np.array(
-            [
-                interval_difference(r, validity_interval, cycle_length)
-                for r in validity_intervals
-            ]
-        )
-        # remove intervals of length 0:
-        mask_is_nonzero = validity_intervals[:, 0] != validity_intervals[:, 1]
-        validity_intervals = validity_intervals[mask_is_nonzero]
-        interval_indexes = interval_indexes[mask_is_nonzero]
-
-        validity_intervals_extended = extend_intervals(validity_intervals, cycle_length)
-
-        if len(validity_intervals_extended) == 0:
-            break
+    arc_idxs, arc_intervals = _select_arcs(
+        np.asarray(validity_intervals, dtype=np.int64), contour.shape[0]
+    )
 
-    arc_ordering = np.array([c[0] for c in arcs]).argsort()
+    arc_ordering = arc_idxs.argsort()
     return [
         ApproximatingArc(
-            arcs[i][1], contour, centers[arcs[i][0]], radii[arcs[i][0]], arcs[i][0]
+            arc_intervals[i],
+            contour,
+            centers[arc_idxs[i]],
+            radii[arc_idxs[i]],
+            arc_idxs[i],
         )
         for i in arc_ordering
     ]
 
 
+@njit(cache=True)
+def _is_in_cyclic_interval(num: int, start: int, end: int, cycle_length: int) -> bool:
+    """Numba version of `geometry.is_in_cyclic_interval`."""
+    num = num % cycle_length
+    start = start % cycle_length
+    end = end % cycle_length
+
+    if start < end:
+        return start <= num <= end
+    return num >= start or num <= end
+
+
+@njit(cache=True)
+def _subtract_interval(
+    start1: int, end1: int, start2: int, end2: int, cycle_length: int
+) -> tuple[int, int]:
+    """Numba version of `geometry.interval_difference`."""
+    if start1 == end1:
+        return start1, end1
+
+    if start1 == start2 and end1 == end2:
+        return start1, start1
+
+    contains_start2 = _is_in_cyclic_interval(start2, start1, end1, cycle_length)
+    contains_end2 = _is_in_cyclic_interval(end2, start1, end1, cycle_length)
+    if contains_start2 and contains_end2:
+        return start1, start1
+
+    if contains_start2:
+        return start1, start2
+
+    if contains_end2:
+        return end2, end1
+
+    if _is_in_cyclic_interval(
+        start1, start2, end2, cycle_length
+    ) and _is_in_cyclic_interval(end1, start2, end2, cycle_length):
+        return start1, start1
+
+    return start1, end1
+
+
+@njit(cache=True)
+def _select_arcs(
+    intervals: np.ndarray, cycle_length: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Greedily select osculating circles with the largest validity intervals.
+
+    In each iteration, find the osculating circle with the largest validity interval.
+    Then, subtract its interval from all other intervals, drop the empty ones and
+    repeat until no interval is longer than 1.
+
+    Parameters
+    ----------
+    intervals
+        2d array of (normalized) validity intervals for each osculating circle.
+    cycle_length
+        Length of the contour.
+
+    Returns
+    -------
+    arc_idxs
+        Indexes of the selected osculating circles, in the order of selection.
+    arc_intervals
+        2d array of the remaining validity intervals of the selected circles.
+    """
+    n = intervals.shape[0]
+    buffer = intervals.copy()
+    interval_idxs = np.arange(n)
+    arc_idxs = np.empty(n, dtype=np.int64)
+    arc_intervals = np.empty((n, 2), dtype=np.int32)
+    n_arcs = 0
+
+    while n > 0:
+        max_i = 0
+        max_length = -1
+        for i in range(n):
+            start, end = buffer[i, 0], buffer[i, 1]
+            length = end - start if start <= end else end + cycle_length - start
+            if length > max_length:
+                max_i = i
+                max_length = length
+        if max_length <= 1:
+            break
+
+        chosen_start, chosen_end = buffer[max_i, 0], buffer[max_i, 1]
+        arc_idxs[n_arcs] = interval_idxs[max_i]
+        arc_intervals[n_arcs, 0] = chosen_start
+        arc_intervals[n_arcs, 1] = chosen_end
+        n_arcs += 1
+
+        # Update intervals in place and remove intervals of length 0
+        new_n = 0
+        for i in range(n):
+            start, end = _subtract_interval(
+                buffer[i, 0], buffer[i, 1], chosen_start, chosen_end, cycle_length
+            )
+            if start != end:
+                buffer[new_n, 0] = start
+                buffer[new_n, 1] = end
+                interval_idxs[new_n] = interval_idxs[i]
+                new_n += 1
+        n = new_n
+
+    return arc_idxs[:n_arcs], arc_intervals[:n_arcs]
+
+
 def get_splitting_points(radii: np.ndarray, min_segment_length: int) -> np.ndarray:
     """Find points where the curve can be split.
 
@@ -453,23 +674,46 @@ def get_splitting_points(radii: np.ndarray, min_segment_length: int) -> np.ndarr
     radii_sorted = np.abs(radii[candidate_points])
     candidate_points = candidate_points[radii_sorted < 15]
 
-    selected_points = []
-    while len(candidate_points) > 0:
-        new_point = candidate_points[0]
-        selected_points.append(new_point)
-        candidate_points = candidate_points[
-            (np.abs(candidate_points - new_point) >= min_segment_length)
-            & (
-                (
-                    np.minimum(new_point, candidate_points)
-                    + len(radii)
-                    - np.maximum(new_point, candidate_points)
-                )
-                >= min_segment_length
-            )
-        ]
+    return _select_splitting_points(candidate_points, min_segment_length, len(radii))
 
-    return np.sort(np.array(selected_points))
+
+@njit(cache=True)
+def _select_splitting_points(
+    candidate_points: np.ndarray, min_segment_length: int, cycle_length: int
+) -> np.ndarray:
+    """Greedily select candidate points which are far enough from each other.
+
+    Parameters
+    ----------
+    candidate_points
+        Indexes of candidate points, ordered by priority.
+    min_segment_length
+        Minimal cyclic distance of two selected points.
+    cycle_length
+        Length of the curve.
+
+    Returns
+    -------
+    Sorted array of selected indexes.
+    """
+    selected_points = np.empty(len(candidate_points), dtype=np.int64)
+    n_selected = 0
+    for new_point in candidate_points:
+        is_far = True
+        for i in range(n_selected):
+            point = selected_points[i]
+            if (
+                abs(new_point - point) < min_segment_length
+                or min(new_point, point) + cycle_length - max(new_point, point)
+                < min_segment_length
+            ):
+                is_far = False
+                break
+        if is_far:
+            selected_points[n_selected] = new_point
+            n_selected += 1
+
+    return np.sort(selected_points[:n_selected])
 
 
 def get_validity_intervals_split(
@@ -508,31 +752,24 @@ def get_validity_intervals_split(
     if len(splitting_points) <= 1:
         return get_validity_intervals(contour, radii, centers, tol_dist, True)
 
-    # Shift contour so it starts in the fist one of splitting points
-    shift = -splitting_points[0]
-    contour = np.roll(contour, shift, axis=0)
-    radii = np.roll(radii, shift)
-    centers = np.roll(centers, shift, axis=0)
-    splitting_points += shift
-
+    cycle_length = len(radii)
     segment_ranges = [
-        extend_interval(interval, len(radii))
+        extend_interval(interval, cycle_length)
         for interval in zip(splitting_points, np.roll(splitting_points, -1))
     ]
-    validity_intervals = list(
-        flatten(
-            [
-                get_validity_intervals(
-                    contour[r[0] : r[1]],
-                    radii[r[0] : r[1]],
-                    centers[r[0] : r[1]],
-                    tol_dist,
-                    False,
-                )
-                + r[0]
-                for r in segment_ranges
-            ]
+    validity_intervals = np.empty((cycle_length, 2), dtype=int)
+    for start, end in segment_ranges:
+        # Only the segment going over the contour start needs an index array,
+        # others are plain views of the original arrays
+        idxs = (
+            slice(start, end)
+            if end <= cycle_length
+            else np.arange(start, end) % cycle_length
         )
-    )
-    validity_intervals = np.roll(validity_intervals, -shift, axis=0)
-    return (validity_intervals - shift) % len(radii)
+        validity_intervals[idxs] = (
+            get_validity_intervals(
+                contour[idxs], radii[idxs], centers[idxs], tol_dist, False
+            )
+            + start
+        )
+    return validity_intervals % cycle_length
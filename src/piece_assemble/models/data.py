@@ -5,7 +5,6 @@ from typing import TYPE_CHECKING
 import numpy as np
 from skimage.morphology import dilation
 
-from geometry import get_common_contour_idxs
 from piece_assemble.types import Points
 from piece_assemble.visualization import draw_contour
 
@@ -16,16 +15,8 @@ if TYPE_CHECKING:
 def get_correspondence_matrix(
     t_piece1: TransformedPiece, t_piece2: TransformedPiece, tol: int = 5
 ) -> np.ndarray:
-    idxs1_closest, idxs2 = get_common_contour_idxs(
-        t_piece1.contour,
-        t_piece2.contour,
-        tol,
-    )
-    idxs2_closest, idxs1 = get_common_contour_idxs(
-        t_piece2.contour,
-        t_piece1.contour,
-        tol,
-    )
+    idxs1_closest, idxs2 = t_piece1.get_common_contour_idxs(t_piece2.contour, tol)
+    idxs2_closest, idxs1 = t_piece2.get_common_contour_idxs(t_piece1.contour, tol)
     similarity_matrix = np.zeros((len(t_piece1.contour), len(t_piece2.contour)))
 
     similarity_matrix[idxs1_closest, idxs2] = 1
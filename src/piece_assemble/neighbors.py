@@ -5,7 +5,6 @@ from typing import TYPE_CHECKING
 
 import numpy as np
 
-from geometry import get_common_contour_idxs
 from piece_assemble.contours import smooth_contours
 from piece_assemble.utils import longest_continuous_subsequence
 
@@ -133,11 +132,7 @@ def longest_continuous_border(
     -------
     The indices of the longest border and the corresponding piece.
     """
-    idxs1, idxs2 = get_common_contour_idxs(
-        piece1.contour,
-        piece2.contour,
-        border_dist_tol,
-    )
+    idxs1, idxs2 = piece1.get_common_contour_idxs(piece2.contour, border_dist_tol)
     if idxs2 is None:
         return [], None
 
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
+from functools import cached_property
 from typing import TYPE_CHECKING
 
 import numpy as np
 import shapely
+from scipy.spatial import KDTree
 from shapely import Polygon, geometry, make_valid
 from skimage.filters import rank
 from skimage.measure import approximate_polygon
 from skimage.morphology import diamond, dilation, disk, erosion
 
-from geometry import Transformation, extend_interval
+from geometry import Transformation, extend_interval, get_common_contour_idxs
 from piece_assemble.contours import extract_contours, smooth_contours
 from piece_assemble.types import Points
 
@@ -161,6 +163,37 @@ class Piece:
 
         return
 
+    @cached_property
+    def area(self) -> float:
+        """Return the area of the piece polygon."""
+        return self.polygon.area
+
+    @cached_property
+    def contour_tree(self) -> KDTree:
+        """Return a KDTree of the piece contour points."""
+        return KDTree(self.contour)
+
+    def get_common_contour_idxs(
+        self, contour: Points, tol: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the part of the piece contour which is close to the given contour.
+
+        Parameters
+        ----------
+        contour
+            2d array of points of the other contour.
+        tol
+            Maximum distance of two points to be considered close.
+
+        Returns
+        -------
+        idxs1
+            Indexes of the closest points of the piece contour.
+        idxs2
+            Indexes of points of `contour` which are close to the piece contour.
+        """
+        return get_common_contour_idxs(self.contour, contour, tol, self.contour_tree)
+
     def get_segment_lengths(self) -> np.ndarray:
         def arc_len(arc: ApproximatingArc):
             extended_interval = extend_interval(arc.interval, len(self.contour))
@@ -181,24 +214,24 @@ class Piece:
             The angle is given in radians.
         """
 
-        def is_large_enough(arc: ApproximatingArc) -> bool:
-            if (
-                np.linalg.norm(
-                    self.contour[arc.interval[0]] - self.contour[arc.interval[1]]
-                )
-                >= min_size
-            ):
-                return True
-            length = len(arc)
-            return length >= np.abs(arc.radius) * min_angle
-
-        new_arcs = [arc for arc in self.descriptor.segments if is_large_enough(arc)]
-        if len(new_arcs) == len(self.descriptor.segments):
+        arcs = self.descriptor.segments
+        if len(arcs) == 0:
             return
 
-        self.descriptor.segments = new_arcs
-        self.descriptor = np.array(
-            [self.segment_descriptor(arc.contour) for arc in self.descriptor.segments]
+        intervals = np.array([arc.interval for arc in arcs])
+        chord_lengths = np.linalg.norm(
+            self.contour[intervals[:, 0]] - self.contour[intervals[:, 1]], axis=1
+        )
+        lengths = np.array([len(arc) for arc in arcs])
+        radii = np.abs([arc.radius for arc in arcs])
+
+        is_large_enough = (chord_lengths >= min_size) | (lengths >= radii * min_angle)
+        if is_large_enough.all():
+            return
+
+        new_arcs = [arc for arc, keep in zip(arcs, is_large_enough) if keep]
+        self.descriptor = self.descriptor_extractor.describe_segments(
+            self.to_piece().contour, new_arcs, self.img_avg
         )
 
     def to_piece(self) -> Piece:
@@ -217,18 +250,79 @@ class TransformedPiece(Piece):
             piece.descriptor,
             piece.holes,
             piece.hole_descriptors,
-            piece.polygon,
+            # Transformed polygon is created lazily by the `polygon` property
+            None,
         )
         self._piece = piece
 
-        self.polygon = shapely.transform(piece.polygon, transformation.apply)
         self.contour = transformation.apply(piece.contour)
         self.transformation = transformation
 
+    @property
+    def polygon(self) -> Polygon:
+        """Return the transformed polygon.
+
+        The polygon is transformed lazily on the first access, because pieces are
+        often transformed repeatedly (e.g. during finetuning) and only the final
+        position is used in polygon operations.
+        """
+        if self._polygon is None:
+            TransformedPiece.transform_polygons([self])
+        return self._polygon
+
+    @polygon.setter
+    def polygon(self, polygon: Polygon) -> None:
+        self._polygon = polygon
+
+    @staticmethod
+    def transform_polygons(pieces: list[TransformedPiece]) -> None:
+        """Transform polygons of all given pieces which were not transformed yet.
+
+        Coordinates of all polygons are transformed together in a single vectorized
+        operation instead of transforming each polygon separately.
+
+        Parameters
+        ----------
+        pieces
+            A list of transformed pieces.
+        """
+        pieces = [piece for piece in pieces if piece._polygon is None]
+        if len(pieces) == 0:
+            return
+
+        polygons = np.array([piece._piece.polygon for piece in pieces], dtype=object)
+        coords, idxs = shapely.get_coordinates(polygons, return_index=True)
+        rotations = np.array([piece.transformation.rotation_matrix for piece in pieces])
+        translations = np.array([piece.transformation.translation for piece in pieces])
+        coords = np.einsum("ij,ijk->ik", coords, rotations[idxs]) + translations[idxs]
+
+        polygons = shapely.set_coordinates(polygons, coords)
+        for piece, polygon in zip(pieces, polygons):
+            piece._polygon = polygon
+
+    @property
+    def area(self) -> float:
+        """Return the area of the piece polygon.
+
+        Transformations only rotate and translate pieces, so the area of the original
+        piece is returned without transforming the polygon.
+        """
+        return self._piece.area
+
     @property
     def original_contour(self) -> Points:
         return self._piece.contour
 
+    def get_common_contour_idxs(
+        self, contour: Points, tol: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Distances are preserved by the transformation, so the given contour can be
+        # queried against the tree of the original piece, which is built only once
+        # no matter how many times the piece is transformed.
+        return self._piece.get_common_contour_idxs(
+            self.transformation.inverse().apply(contour), tol
+        )
+
     def transform(self, transformation: Transformation) -> TransformedPiece:
         return TransformedPiece(
             self._piece, self.transformation.compose(transformation)
@@ -8,12 +8,23 @@ class Segment:
     def __init__(self, interval: Interval, contour: Points, offset: int = 0):
         self.interval = interval
         self.offset = offset
+        self.curve = contour
         ex_interval = extend_interval(interval, len(contour))
-        idxs = np.arange(ex_interval[0], ex_interval[1]) % len(contour) + offset
-        self.contour = contour[idxs]
+        self.length = int(ex_interval[1] - ex_interval[0])
+
+    @property
+    def idxs(self) -> np.ndarray[int]:
+        """Indexes of segment points within the whole curve."""
+        start = self.interval[0] + self.offset
+        return np.arange(start, start + self.length) % len(self.curve)
+
+    @property
+    def contour(self) -> Points:
+        """Points of the segment, gathered from the whole curve on access."""
+        return self.curve[self.idxs]
 
     def __len__(self) -> int:
-        return len(self.contour)
+        return self.length
 
 
 class ApproximatingArc(Segment):
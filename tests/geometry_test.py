@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy.spatial import KDTree
+
+from geometry import (
+    Transformation,
+    bounding_boxes_overlap,
+    get_common_contour_idxs,
+    transformations_close,
+)
+
+
+@pytest.mark.parametrize(
+    "box1, box2, tol, expected",
+    [
+        ((0, 0, 10, 10), (5, 5, 15, 15), 0, True),
+        ((0, 0, 10, 10), (2, 2, 8, 8), 0, True),
+        ((0, 0, 10, 10), (10, 0, 20, 10), 0, True),
+        ((0, 0, 10, 10), (12, 0, 20, 10), 0, False),
+        ((0, 0, 10, 10), (12, 0, 20, 10), 3, True),
+        ((0, 0, 10, 10), (0, 12, 10, 20), 0, False),
+        ((0, 0, 10, 10), (-20, -20, -12, -12), 0, False),
+    ],
+)
+def test_bounding_boxes_overlap(box1, box2, tol, expected):
+    box1, box2 = np.array(box1), np.array(box2)
+    assert bounding_boxes_overlap(box1, box2, tol) == expected
+    assert bounding_boxes_overlap(box2, box1, tol) == expected
+
+
+def test_transformations_close():
+    rng = np.random.default_rng(0)
+    transformations1 = [
+        Transformation(angle, translation)
+        for angle, translation in zip(
+            rng.uniform(0, 2 * np.pi, 50), rng.uniform(-100, 100, (50, 2))
+        )
+    ]
+    transformations2 = [
+        Transformation(t.rotation_angle + angle, t.translation + translation)
+        for t, angle, translation in zip(
+            transformations1, rng.normal(0, 0.2, 50), rng.normal(0, 20, (50, 2))
+        )
+    ]
+
+    expected = [t1.is_close(t2) for t1, t2 in zip(transformations1, transformations2)]
+    result = transformations_close(transformations1, transformations2)
+    assert list(result) == expected
+    assert 0 < sum(expected) < len(expected)
+
+
+def test_get_common_contour_idxs_transformed_tree():
+    rng = np.random.default_rng(0)
+    contour1 = rng.uniform(0, 100, (200, 2))
+    contour2 = rng.uniform(0, 100, (150, 2))
+    transformation = Transformation(0.7, np.array([30.0, -12.0]))
+
+    expected = get_common_contour_idxs(transformation.apply(contour1), contour2, tol=3)
+    result = get_common_contour_idxs(
+        contour1,
+        transformation.inverse().apply(contour2),
+        tol=3,
+        tree1=KDTree(contour1),
+    )
+    assert len(expected[0]) > 0
+    assert np.array_equal(result[0], expected[0])
+    assert np.array_equal(result[1], expected[1])
@@ -0,0 +1,177 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+from shapely import Polygon, box
+
+from geometry import Transformation
+from piece_assemble.cluster import Cluster, DummyClusterScorer, SelfIntersectionError
+from piece_assemble.neighbors import NeighborClassifierBase
+from piece_assemble.piece import Piece, TransformedPiece
+
+
+def make_piece(
+    name: str, polygon: Polygon, transformation: Transformation | None = None
+) -> TransformedPiece:
+    if transformation is None:
+        transformation = Transformation(0, np.zeros(2))
+    contour = np.array(polygon.exterior.coords)
+    piece = Piece(name, None, None, None, contour, None, None, [], [], polygon)
+    return TransformedPiece(piece, transformation)
+
+
+class AllNeighborsClassifier(NeighborClassifierBase):
+    def __call__(self, piece1: TransformedPiece, piece2: TransformedPiece) -> bool:
+        return True
+
+
+def make_cluster(pieces: dict[str, TransformedPiece]) -> Cluster:
+    return Cluster(
+        pieces, DummyClusterScorer(), 0.05, 4, 0.17, 30, AllNeighborsClassifier()
+    )
+
+
+def intersection_ratio(p1: Polygon, p2: Polygon) -> float:
+    return p1.intersection(p2).area / min(p1.area, p2.area)
+
+
+CLUSTER_POLYGONS = {
+    "overlapping": {
+        "a": box(0, 0, 10, 10),
+        "b": box(5, 0, 15, 10),
+        "c": box(9, 9, 19, 19),
+        "d": box(2, 2, 4, 4),
+        "e": box(30, 30, 40, 40),
+    },
+    "one_piece": {"a": box(0, 0, 10, 10)},
+    "disjoint": {
+        "a": box(0, 0, 10, 10),
+        "b": box(20, 0, 30, 10),
+        "c": box(0, 20, 10, 30),
+    },
+}
+
+
+@pytest.fixture(params=list(CLUSTER_POLYGONS))
+def cluster(request) -> Cluster:
+    transformation = Transformation(0.4, np.array([3.0, -7.0]))
+    return make_cluster(
+        {
+            key: make_piece(key, polygon, transformation)
+            for key, polygon in CLUSTER_POLYGONS[request.param].items()
+        }
+    )
+
+
+def test_self_intersection(cluster):
+    polygons = [piece.polygon for piece in cluster.pieces.values()]
+    expected = max(
+        [intersection_ratio(p1, p2) for p1, p2 in combinations(polygons, 2)],
+        default=0.0,
+    )
+    assert cluster.self_intersection == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("pieces_to_keep", [set(), {"a"}, {"b", "d"}])
+def test_fix_overlapping_pieces(cluster, pieces_to_keep):
+    tol = cluster.self_intersection_tol * (np.log2(len(cluster.pieces)) + 1)
+    expected = set(cluster.pieces)
+    for key1, key2 in combinations(cluster.pieces, 2):
+        p1 = cluster.pieces[key1].polygon
+        p2 = cluster.pieces[key2].polygon
+        if intersection_ratio(p1, p2) > tol:
+            expected -= {key1, key2} - pieces_to_keep
+
+    assert len(expected) > 0
+    assert set(cluster._fix_overlapping_pieces(pieces_to_keep).pieces) == expected
+
+
+@pytest.mark.parametrize(
+    "polygon",
+    [
+        box(-1000, -1000, -990, -990),
+        box(0, 0, 12, 12),
+        Polygon([(-5, 5), (20, -5), (25, 25)]),
+    ],
+)
+def test_intersection(cluster, polygon):
+    polygons = [piece.polygon for piece in cluster.pieces.values()]
+    expected = max(
+        [p.intersection(polygon).area / min(p.area, polygon.area) for p in polygons]
+    )
+    assert cluster.intersection(polygon) == pytest.approx(expected)
+
+
+def test_transform_keeps_self_intersection(cluster):
+    self_intersection = cluster.self_intersection
+    transformation = Transformation(1.3, np.array([-20.0, 8.0]))
+
+    for new_cluster in [cluster.copy(), cluster.transform(transformation)]:
+        assert "self_intersection" in new_cluster.__dict__
+        assert new_cluster.self_intersection == self_intersection
+        recomputed = make_cluster(new_cluster.pieces).self_intersection
+        assert recomputed == pytest.approx(self_intersection)
+
+
+@pytest.fixture
+def transformed_clusters(monkeypatch) -> list[Cluster]:
+    """Record clusters created by `Cluster.transform` during the test."""
+    clusters = []
+    transform = Cluster.transform
+
+    def recording_transform(self, transformation):
+        new_cluster = transform(self, transformation)
+        clusters.append(new_cluster)
+        return new_cluster
+
+    monkeypatch.setattr(Cluster, "transform", recording_transform)
+    return clusters
+
+
+def make_conflicting_clusters(polygon_d: Polygon) -> tuple[Cluster, Cluster]:
+    cluster1 = make_cluster(
+        {
+            "a": make_piece("a", box(0, 0, 4, 4)),
+            "b": make_piece("b", box(10, 0, 20, 10)),
+            "c": make_piece("c", box(0, 10, 10, 20)),
+        }
+    )
+    transformation = Transformation(0.5, np.array([3.0, 4.0]))
+    # Piece "c" is placed differently in the second cluster
+    cluster2 = make_cluster(
+        {
+            "a": make_piece("a", box(0, 0, 4, 4), transformation),
+            "c": make_piece(
+                "c", box(0, 10, 10, 20), Transformation(0.5, np.array([103.0, 4.0]))
+            ),
+            "d": make_piece("d", polygon_d, transformation),
+        }
+    )
+    return cluster1, cluster2
+
+
+def test_merge_conflicting_piece(transformed_clusters):
+    cluster1, cluster2 = make_conflicting_clusters(box(20, 20, 30, 30))
+
+    merged = cluster1.merge(cluster2, finetune_iters=0, try_fix=True)
+
+    assert set(merged.pieces) == {"a", "b", "c", "d"}
+    assert merged.pieces["c"] is transformed_clusters[0].pieces["c"]
+    assert [set(c.pieces) for c in transformed_clusters] == [
+        {"a", "b", "c"},
+        {"a", "c", "d"},
+    ]
+
+
+def test_merge_conflicting_piece_self_intersection(transformed_clusters):
+    cluster1, cluster2 = make_conflicting_clusters(box(12, 0, 20, 8))
+
+    # Only two pieces of the second cluster remain after dropping the conflicting
+    # one, so the overlap can't be fixed
+    with pytest.raises(SelfIntersectionError):
+        cluster1.merge(cluster2, finetune_iters=0, try_fix=True)
+
+    assert [set(c.pieces) for c in transformed_clusters] == [
+        {"a", "b", "c"},
+        {"a", "c", "d"},
+    ]
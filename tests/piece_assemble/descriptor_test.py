@@ -0,0 +1,177 @@
+import itertools
+
+import numpy as np
+import pytest
+from more_itertools import flatten
+
+from geometry import extend_interval, interval_difference, points_dist
+from piece_assemble.contours import get_osculating_circles, get_validity_intervals
+from piece_assemble.descriptor import (
+    OsculatingCircleDescriptor,
+    _desc_distance_numba,
+    _subtract_interval,
+    get_splitting_points,
+    get_validity_intervals_split,
+)
+from piece_assemble.segment import Segment
+
+
+@pytest.mark.parametrize("n_points, n_extra_cols", [(1, 0), (3, 0), (5, 21)])
+def test_desc_distance_numba(n_points, n_extra_cols):
+    rng = np.random.default_rng(0)
+    desc1 = rng.normal(size=(7, n_points * 2 + n_extra_cols))
+    desc2 = rng.normal(size=(4, n_points * 2 + n_extra_cols))
+
+    expected = np.zeros((desc1.shape[0], desc2.shape[0]))
+    for i in range(n_points):
+        expected += points_dist(
+            desc1[:, i * 2 : (i + 1) * 2],
+            -desc2[:, (n_points - i - 1) * 2 : (n_points - i) * 2],
+        )
+    expected /= n_points
+
+    assert np.allclose(_desc_distance_numba(desc1, desc2, n_points), expected)
+
+
+@pytest.mark.parametrize("n_colors, channels", [(1, 3), (7, 3), (4, 1)])
+def test_color_dist(n_colors, channels):
+    rng = np.random.default_rng(0)
+    extractor = OsculatingCircleDescriptor(
+        n_points=5, n_colors=n_colors, channels=channels
+    )
+    n_cols = extractor.n_points * 2 + n_colors * channels
+    desc1 = rng.uniform(size=(6, n_cols))
+    desc2 = rng.uniform(size=(9, n_cols))
+
+    expected = np.zeros((desc1.shape[0], desc2.shape[0]))
+    colors_start = extractor.n_points * 2
+    for i in range(n_colors):
+        expected += points_dist(
+            desc1[:, colors_start + i * channels : colors_start + (i + 1) * channels],
+            desc2[:, n_cols - (i + 1) * channels : n_cols - i * channels],
+        )
+    expected /= n_colors
+
+    assert np.allclose(extractor.color_dist(desc1, desc2), expected)
+
+
+def reference_segment_descriptor(extractor, segment, img):
+    def get_points(n_points):
+        subsegment_len = len(segment) // (n_points - 1)
+        return [
+            segment.contour[0],
+            *[segment.contour[subsegment_len * (i + 1)] for i in range(n_points - 2)],
+            segment.contour[-1],
+        ]
+
+    centroid = segment.contour.mean(axis=0)
+    rot_vector = segment.contour[0] - segment.contour[-1]
+    sin_a, cos_a = rot_vector / np.linalg.norm(rot_vector)
+    rot_matrix = np.array([[cos_a, sin_a], [-sin_a, cos_a]])
+
+    desc_vectors = [
+        (vector - centroid) @ rot_matrix for vector in get_points(extractor.n_points)
+    ]
+    desc_colors = [
+        img[round(point[0]), round(point[1])]
+        for point in get_points(extractor.n_colors)
+    ]
+    return np.concatenate(desc_vectors + desc_colors)
+
+
+@pytest.mark.parametrize("offset", [0, 20])
+def test_segments_descriptor(offset):
+    rng = np.random.default_rng(0)
+    img = rng.uniform(size=(100, 100, 3))
+    t = np.linspace(0, 2 * np.pi, 300, endpoint=False)
+    contour = np.stack((50 + 40 * np.sin(t), 50 + 30 * np.cos(t)), axis=1)
+    extractor = OsculatingCircleDescriptor(n_points=5, n_colors=7)
+
+    # The first segment crosses index 0
+    intervals = [(280, 20), (0, 50), (100, 180), (180, 187), (299, 150)]
+    segments = [Segment(interval, contour, offset) for interval in intervals]
+
+    expected = np.array(
+        [reference_segment_descriptor(extractor, s, img) for s in segments]
+    )
+    assert np.allclose(extractor.segments_descriptor(contour, segments, img), expected)
+    assert np.allclose(extractor.segment_descriptor(segments[0], img), expected[0])
+
+
+def test_subtract_interval():
+    cycle_length = 6
+    bounds = range(cycle_length)
+    for start1, end1, start2, end2 in itertools.product(bounds, repeat=4):
+        expected = interval_difference(
+            np.array([start1, end1]), np.array([start2, end2]), cycle_length
+        )
+        result = _subtract_interval(start1, end1, start2, end2, cycle_length)
+        assert tuple(result) == tuple(expected)
+
+
+@pytest.mark.parametrize("min_segment_length", [1, 10, 100])
+def test_get_splitting_points(min_segment_length):
+    rng = np.random.default_rng(0)
+    radii = rng.uniform(-30, 30, 500)
+
+    candidate_points = np.argsort(np.abs(radii))
+    candidate_points = candidate_points[np.abs(radii[candidate_points]) < 15]
+    expected = []
+    while len(candidate_points) > 0:
+        new_point = candidate_points[0]
+        expected.append(new_point)
+        candidate_points = candidate_points[
+            (np.abs(candidate_points - new_point) >= min_segment_length)
+            & (
+                np.minimum(new_point, candidate_points)
+                + len(radii)
+                - np.maximum(new_point, candidate_points)
+                >= min_segment_length
+            )
+        ]
+
+    result = get_splitting_points(radii, min_segment_length)
+    assert np.array_equal(result, np.sort(expected))
+
+
+def test_get_validity_intervals_split():
+    t = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+    radius = 100 + 40 * np.sin(5 * t + 0.4)
+    contour = np.stack((150 + radius * np.sin(t), 150 + radius * np.cos(t)), axis=1)
+    radii, centers = get_osculating_circles(contour)
+    tol_dist, min_segment_length = 2, 200
+
+    splitting_points = get_splitting_points(radii, min_segment_length)
+    assert len(splitting_points) > 1 and splitting_points[0] != 0
+
+    # Reference: shift the contour to start in the first splitting point
+    shift = -splitting_points[0]
+    contour_shifted = np.roll(contour, shift, axis=0)
+    radii_shifted = np.roll(radii, shift)
+    centers_shifted = np.roll(centers, shift, axis=0)
+    splitting_points += shift
+    segment_ranges = [
+        extend_interval(interval, len(radii))
+        for interval in zip(splitting_points, np.roll(splitting_points, -1))
+    ]
+    expected = list(
+        flatten(
+            [
+                get_validity_intervals(
+                    contour_shifted[r[0] : r[1]],
+                    radii_shifted[r[0] : r[1]],
+                    centers_shifted[r[0] : r[1]],
+                    tol_dist,
+                    False,
+                )
+                + r[0]
+                for r in segment_ranges
+            ]
+        )
+    )
+    expected = (np.roll(expected, -shift, axis=0) - shift) % len(radii)
+
+    result = get_validity_intervals_split(
+        contour, radii, centers, tol_dist, min_segment_length
+    )
+    assert np.array_equal(result, expected)
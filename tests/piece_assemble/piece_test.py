@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+import shapely
+from shapely import GeometryCollection, LineString, MultiPolygon, Polygon
+
+from geometry import Transformation
+from piece_assemble.descriptor import OsculatingCircleDescriptor
+from piece_assemble.piece import Piece, TransformedPiece
+
+
+def test_transform_polygons():
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    polygons = [
+        Polygon(square, [[(2, 2), (4, 2), (4, 4)], [(6, 6), (8, 6), (8, 8)]]),
+        MultiPolygon([Polygon([(0, 0), (1, 0), (1, 1)]), Polygon(square)]),
+        GeometryCollection([Polygon(square), LineString([(20, 20), (30, 25)])]),
+    ]
+    transformations = [
+        Transformation(0.3, np.array([1.0, 2.0])),
+        Transformation(2.1, np.array([-5.0, 7.0])),
+        Transformation(4.0, np.array([0.5, -30.0])),
+    ]
+    pieces = [
+        Piece(str(i), None, None, None, np.zeros((3, 2)), None, None, [], [], polygon)
+        for i, polygon in enumerate(polygons)
+    ]
+    originals = [shapely.from_wkb(shapely.to_wkb(polygon)) for polygon in polygons]
+    t_pieces = [
+        TransformedPiece(piece, transformation)
+        for piece, transformation in zip(pieces, transformations)
+    ]
+
+    TransformedPiece.transform_polygons(t_pieces)
+
+    for t_piece, piece, original, transformation in zip(
+        t_pieces, pieces, originals, transformations
+    ):
+        expected = shapely.transform(original, transformation.apply)
+        assert t_piece.polygon.equals_exact(expected, 1e-9)
+        assert piece.polygon.equals_exact(original, 0)
+
+
+@pytest.mark.parametrize("transformed", [False, True])
+@pytest.mark.parametrize("min_size, min_angle", [(50, 0.5), (80, 1.0)])
+def test_filter_small_arcs(transformed, min_size, min_angle):
+    t = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+    radius = 100 + 40 * np.sin(5 * t + 0.4)
+    contour = np.stack((150 + radius * np.sin(t), 150 + radius * np.cos(t)), axis=1)
+    img = np.random.default_rng(0).uniform(size=(300, 300, 3))
+    extractor = OsculatingCircleDescriptor(n_points=5, n_colors=3, tol_dist=2)
+    descriptor = extractor.extract(contour, img)
+    piece = Piece(
+        "p", img, img, None, contour, extractor, descriptor, [], [], Polygon(contour)
+    )
+    if transformed:
+        piece = TransformedPiece(piece, Transformation(1.2, np.array([40.0, -25.0])))
+
+    arcs = descriptor.segments
+    expected_arcs = [
+        arc
+        for arc in arcs
+        if np.linalg.norm(contour[arc.interval[0]] - contour[arc.interval[1]])
+        >= min_size
+        or len(arc) >= abs(arc.radius) * min_angle
+    ]
+    assert 0 < len(expected_arcs) < len(arcs)
+
+    piece.filter_small_arcs(min_size, min_angle)
+
+    assert piece.descriptor.segments == expected_arcs
+    assert np.allclose(
+        piece.descriptor.features,
+        extractor.segments_descriptor(contour, expected_arcs, img),
+        atol=1e-4,
+    )